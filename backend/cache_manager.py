@@ -8,23 +8,61 @@ repeated heavy work.
 
 from __future__ import annotations
 
+import asyncio
+import atexit
+import contextvars
+import heapq
 import json
 import os
+import queue
+import socket
 import threading
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set
 
 try:  # pragma: no cover - optional dependency
     import redis  # type: ignore
 except ImportError:  # pragma: no cover - optional dependency
     redis = None  # type: ignore
 
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "32"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+WRITE_BATCH_MAX_ITEMS = 256
+WRITE_BATCH_MAX_WAIT = 0.005  # seconds
+
+# TCP keepalive tuning (Linux constants; skipped on platforms that lack them)
+_KEEPALIVE_OPTIONS = {
+    opt: value
+    for opt, value in (
+        (getattr(socket, "TCP_KEEPIDLE", None), 60),
+        (getattr(socket, "TCP_KEEPINTVL", None), 10),
+        (getattr(socket, "TCP_KEEPCNT", None), 3),
+    )
+    if opt is not None
+}
+
+try:  # pragma: no cover - optional dependency
+    import orjson  # type: ignore
+
+    def _json_dumps(value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore
+
+    def _json_dumps(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+    _json_loads = json.loads
+
 
 class _InMemoryTTLCache:
     """Lightweight thread-safe TTL cache as a Redis fallback."""
 
     def __init__(self):
         self._store: Dict[str, tuple[float, Any]] = {}
+        self._expiry_heap: List[tuple[float, str]] = []
         self._lock = threading.Lock()
 
     def get(self, key: str) -> Optional[Any]:
@@ -39,9 +77,35 @@ class _InMemoryTTLCache:
             return value
 
     def set(self, key: str, value: Any, ttl_seconds: int) -> None:
-        expires_at = time.time() + ttl_seconds
+        now = time.time()
+        expires_at = now + ttl_seconds
         with self._lock:
             self._store[key] = (expires_at, value)
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            # Amortized sweep so keys that are never read again still get evicted
+            self._expire_locked(now)
+            # Overwritten keys leave stale heap entries until their old deadline;
+            # rebuild once they outnumber the live ones so the heap stays bounded
+            if len(self._expiry_heap) > 2 * len(self._store):
+                self._compact_locked()
+
+    def expire(self, now: Optional[float] = None) -> None:
+        """Drop every entry whose deadline has passed."""
+        with self._lock:
+            self._expire_locked(time.time() if now is None else now)
+
+    def _compact_locked(self) -> None:
+        self._expiry_heap = [(expires_at, key) for key, (expires_at, _) in self._store.items()]
+        heapq.heapify(self._expiry_heap)
+
+    def _expire_locked(self, now: float) -> None:
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._store.get(key)
+            # Skip stale heap entries left behind when a key was overwritten
+            if entry and entry[0] == expires_at:
+                del self._store[key]
 
 
 class CacheManager:
@@ -52,24 +116,82 @@ class CacheManager:
         self._redis_client = None
         if redis_url and redis:
             try:
-                self._redis_client = redis.Redis.from_url(redis_url)
+                # Explicit pool shared by the module-global cache_manager; bytes
+                # responses (decode_responses=False) feed orjson directly.
+                pool = redis.BlockingConnectionPool.from_url(
+                    redis_url,
+                    max_connections=REDIS_POOL_SIZE,
+                    socket_keepalive=True,
+                    socket_keepalive_options=_KEEPALIVE_OPTIONS,
+                    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+                    decode_responses=False,
+                )
+                self._redis_client = redis.Redis(connection_pool=pool)
             except Exception:  # pragma: no cover - connection failure
                 self._redis_client = None
         self._fallback_cache = _InMemoryTTLCache()
+        self._write_q: "queue.Queue[tuple[str, str | bytes, int]]" = queue.Queue()
+        if self._redis_client:
+            threading.Thread(target=self._write_loop, name="cache-writer", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _drain_write_queue(self, block: bool) -> List[tuple[str, str | bytes, int]]:
+        """Collect up to WRITE_BATCH_MAX_ITEMS queued writes within WRITE_BATCH_MAX_WAIT."""
+        batch = []
+        try:
+            batch.append(self._write_q.get(block=block))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + WRITE_BATCH_MAX_WAIT
+        while len(batch) < WRITE_BATCH_MAX_ITEMS:
+            remaining = deadline - time.monotonic()
+            try:
+                if block and remaining > 0:
+                    batch.append(self._write_q.get(timeout=remaining))
+                else:
+                    batch.append(self._write_q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch: List[tuple[str, str | bytes, int]]) -> None:
+        try:
+            pipe = self._redis_client.pipeline(transaction=False)
+            for key, value, ttl_seconds in batch:
+                pipe.setex(key, ttl_seconds, value)
+            pipe.execute()
+        except Exception:
+            for key, value, ttl_seconds in batch:
+                self._fallback_cache.set(key, value, ttl_seconds)
 
-    def _serialize(self, value: Any) -> str:
+    def _write_loop(self) -> None:
+        while True:
+            batch = self._drain_write_queue(block=True)
+            if batch:
+                self._write_batch(batch)
+
+    def flush(self) -> None:
+        """Synchronously write any queued cache entries (used on shutdown)."""
+        while True:
+            batch = self._drain_write_queue(block=False)
+            if not batch:
+                return
+            self._write_batch(batch)
+
+    def _serialize(self, value: Any) -> str | bytes:
         if isinstance(value, (str, bytes)):
-            return value if isinstance(value, str) else value.decode("utf-8")
-        return json.dumps(value, ensure_ascii=False)
+            return value
+        # orjson returns bytes, which Redis accepts without a decode round-trip
+        return _json_dumps(value)
 
     def _deserialize(self, cached: Optional[bytes | str]) -> Optional[Any]:
         if cached is None:
             return None
-        if isinstance(cached, bytes):
-            cached = cached.decode("utf-8")
         try:
-            return json.loads(cached)
-        except json.JSONDecodeError:
+            return _json_loads(cached)
+        except json.JSONDecodeError:  # orjson.JSONDecodeError subclasses it
+            if isinstance(cached, bytes):
+                return cached.decode("utf-8", errors="replace")
             return cached
 
     def get(self, key: str) -> Optional[Any]:
@@ -80,10 +202,18 @@ class CacheManager:
                     return self._deserialize(cached)
             except Exception:
                 pass  # fallback below
-        cached = self._fallback_cache.get(key)
-        return cached
+        return self._deserialize(self._fallback_cache.get(key))
 
     def set(self, key: str, value: Any, ttl_seconds: int = 300) -> None:
+        """Fire-and-forget write; batched into a pipeline by the writer thread."""
+        serialized = self._serialize(value)
+        if self._redis_client:
+            self._write_q.put((key, serialized, ttl_seconds))
+            return
+        self._fallback_cache.set(key, serialized, ttl_seconds)
+
+    def set_sync(self, key: str, value: Any, ttl_seconds: int = 300) -> None:
+        """Write through to Redis and wait for the acknowledgement."""
         serialized = self._serialize(value)
         if self._redis_client:
             try:
@@ -93,7 +223,114 @@ class CacheManager:
                 pass
         self._fallback_cache.set(key, serialized, ttl_seconds)
 
+    def mget(self, keys: Iterable[str]) -> List[Optional[Any]]:
+        """Fetch many keys in a single Redis round-trip (pipelined)."""
+        keys = list(keys)
+        results: List[Optional[bytes | str]] = [None] * len(keys)
+        if self._redis_client and keys:
+            try:
+                pipe = self._redis_client.pipeline(transaction=False)
+                for key in keys:
+                    pipe.get(key)
+                results = pipe.execute()
+            except Exception:
+                results = [None] * len(keys)  # fallback below
+        return [
+            self._deserialize(cached if cached is not None else self._fallback_cache.get(key))
+            for key, cached in zip(keys, results)
+        ]
+
+    def mset(self, items: Dict[str, Any], ttl_seconds: int = 300) -> None:
+        """Store many keys in a single Redis round-trip (pipelined)."""
+        if not items:
+            return
+        serialized = {key: self._serialize(value) for key, value in items.items()}
+        if self._redis_client:
+            try:
+                pipe = self._redis_client.pipeline(transaction=False)
+                for key, value in serialized.items():
+                    pipe.setex(key, ttl_seconds, value)
+                pipe.execute()
+                return
+            except Exception:
+                pass
+        for key, value in serialized.items():
+            self._fallback_cache.set(key, value, ttl_seconds)
+
 
 cache_manager = CacheManager()
 
 
+class CacheBatcher:
+    """
+    Per-request read coalescer (dataloader pattern).
+
+    Keys requested with ``get`` during the same event-loop tick are resolved
+    together by one ``CacheManager.mget`` (a single pipelined round-trip).
+    The blocking ``mget`` runs in a worker thread, never on the event loop.
+    """
+
+    def __init__(self, manager: CacheManager):
+        self._manager = manager
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get(self, key: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending:
+            # The task starts on the next tick, after this tick's callers have queued their keys
+            task = loop.create_task(self._dispatch())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._pending.setdefault(key, []).append(future)
+        return future
+
+    async def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        keys = list(pending)
+        try:
+            values = await asyncio.to_thread(self._manager.mget, keys)
+        except Exception as exc:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            return
+        for key, value in zip(keys, values):
+            for future in pending[key]:
+                if not future.done():
+                    future.set_result(value)
+
+    async def flush(self) -> None:
+        """Resolve any keys still queued (called before the response is finished)."""
+        await self._dispatch()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+_current_batcher: contextvars.ContextVar[Optional[CacheBatcher]] = contextvars.ContextVar(
+    "cache_batcher", default=None
+)
+
+
+def bind_request_batcher() -> tuple[CacheBatcher, contextvars.Token]:
+    """Attach a fresh CacheBatcher to the current request context."""
+    batcher = CacheBatcher(cache_manager)
+    return batcher, _current_batcher.set(batcher)
+
+
+def reset_request_batcher(token: contextvars.Token) -> None:
+    _current_batcher.reset(token)
+
+
+async def cache_get(key: str) -> Optional[Any]:
+    """Read through the request's CacheBatcher when one is bound, else directly."""
+    batcher = _current_batcher.get()
+    if batcher is None:
+        return await asyncio.to_thread(cache_manager.get, key)
+    return await batcher.get(key)
+
+
@@ -1,41 +1,74 @@
 import json
 import os
 import logging
-from typing import Dict, Any
+import types
+from typing import Callable, List, Mapping, Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - fallback if orjson not installed
+    orjson = None
 
 logger = logging.getLogger("CONFIG_MANAGER")
 CONFIG_FILE_PATH = os.getenv("CONFIG_FILE_PATH", "/app/config/settings.json")
-_CONFIG_CACHE: Dict[str, Any] = {}
+_EMPTY_CONFIG: Mapping[str, Any] = types.MappingProxyType({})
+_CONFIG_CACHE: Mapping[str, Any] = _EMPTY_CONFIG
+_LOADED = False
+_RELOAD_CALLBACKS: List[Callable[[], None]] = []
 
-def load_config() -> Dict[str, Any]:
+def load_config() -> Mapping[str, Any]:
     """
     تحميل ملف التكوين (settings.json) إلى الذاكرة المؤقتة.
+    يُعاد التكوين كـ MappingProxyType (للقراءة فقط) لمنع التعديل العرضي.
     """
-    global _CONFIG_CACHE
-    if _CONFIG_CACHE:
+    global _CONFIG_CACHE, _LOADED
+    if _LOADED:
         return _CONFIG_CACHE
-        
+
     try:
-        with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
-            _CONFIG_CACHE = json.load(f)
-            logger.info(f"Configuration loaded successfully from {CONFIG_FILE_PATH}")
-            return _CONFIG_CACHE
+        with open(CONFIG_FILE_PATH, 'rb') as f:
+            raw = f.read()
+        # orjson.JSONDecodeError يرث من json.JSONDecodeError لذا يبقى معالج الأخطاء كما هو
+        data = orjson.loads(raw) if orjson else json.loads(raw.decode('utf-8'))
+        _CONFIG_CACHE = types.MappingProxyType(data)
+        _LOADED = True
+        logger.info(f"Configuration loaded successfully from {CONFIG_FILE_PATH}")
+        return _CONFIG_CACHE
     except FileNotFoundError:
         logger.error(f"Configuration file not found at {CONFIG_FILE_PATH}. Using empty config.")
-        return {}
+        return _EMPTY_CONFIG
     except json.JSONDecodeError as e:
         logger.error(f"Error decoding JSON from configuration file: {e}")
-        return {}
+        return _EMPTY_CONFIG
     except Exception as e:
         logger.error(f"An unexpected error occurred while loading configuration: {e}")
-        return {}
+        return _EMPTY_CONFIG
+
+def reload_config() -> Mapping[str, Any]:
+    """
+    إعادة تحميل ملف التكوين من القرص ومسح القيم المخزنة مؤقتاً.
+    """
+    global _CONFIG_CACHE, _LOADED
+    _CONFIG_CACHE = _EMPTY_CONFIG
+    _LOADED = False
+    for callback in _RELOAD_CALLBACKS:
+        callback()
+    return load_config()
+
+def on_config_reload(callback: Callable[[], None]) -> Callable[[], None]:
+    """
+    تسجيل دالة تُستدعى عند reload_config (مثل cache_clear لقيم مشتقة من التكوين).
+    """
+    _RELOAD_CALLBACKS.append(callback)
+    return callback
 
 def get_config(key: str, default: Any = None) -> Any:
     """
     الحصول على قيمة من التكوين باستخدام مفتاح.
     """
-    config = load_config()
-    return config.get(key, default)
+    if not _LOADED:
+        load_config()
+    return _CONFIG_CACHE.get(key, default)
 
 # تحميل التكوين عند استيراد الملف لأول مرة
 load_config()
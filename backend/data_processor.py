@@ -1,5 +1,9 @@
 import os
+import hashlib
 import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pdfplumber
 from docx import Document as DocxDocument
 from PIL import Image
@@ -7,30 +11,54 @@ import pytesseract
 from typing import List, Dict, Any
 from langchain_core.documents import Document
 
+from cache_manager import cache_manager
+
+try:
+    from charset_normalizer import from_bytes as detect_charset
+except ImportError:  # pragma: no cover - fallback if charset-normalizer not installed
+    detect_charset = None
+
 logger = logging.getLogger("DATA_PROCESSOR")
 
+# ترميزات احتياطية بالترتيب عند عدم توفر charset-normalizer
+_FALLBACK_ENCODINGS = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1256', 'windows-1256']
+# ذاكرة LRU صغيرة للترميز المكتشف لكل ملف: (المسار، وقت التعديل، الحجم) -> الترميز
+_ENCODING_CACHE: "OrderedDict[tuple[str, int, int], str]" = OrderedDict()
+_ENCODING_CACHE_MAX = 256
+# عدد العمليات المتوازية للفهرسة (1 = معالجة تسلسلية لأغراض التصحيح)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+# العمليات تُنشأ بـ spawn لا fork: العملية الأم (خادم الويب) متعددة الخيوط، ونسخ أقفالها بـ fork قد يسبب جموداً
+_INGEST_MP_CONTEXT = multiprocessing.get_context("spawn")
+# أقصى بُعد (بالبكسل) لصورة OCR؛ الصور الأكبر تُصغَّر قبل تمريرها إلى Tesseract
+OCR_MAX_DIMENSION = 2400
+# مدة الاحتفاظ بالنص المستخرج لكل محتوى ملف (بالثواني)
+DOC_CACHE_TTL = int(os.getenv("DOC_CACHE_TTL", "86400"))
+
 # ------------------------------------------------------------
 # وظائف استخراج النص
 # ------------------------------------------------------------
 
 def _extract_text_from_pdf(file_path: str) -> str:
     """يستخرج النص من ملف PDF، بما في ذلك محاولة OCR للصور المضمنة."""
-    full_text = ""
+    # تجميع نصوص الصفحات في قائمة ثم دمجها مرة واحدة بدلاً من += داخل الحلقة
+    # الصفحات تُستخرج تسلسلياً: التوازي متحقق على مستوى الملفات (عمليات الفهرسة)،
+    # وتوزيع صفحات الملف نفسه على خيوط يعيد تحليل الـ PDF تحت الـ GIL دون فائدة
+    parts = []
     try:
         with pdfplumber.open(file_path) as pdf:
             for page in pdf.pages:
                 # استخراج النص العادي
                 text = page.extract_text()
                 if text:
-                    full_text += text + "\n\n"
-                
+                    parts.append(text)
+
                 # محاولة OCR للصور المضمنة (يتطلب مكتبة خارجية مثل pdf2image و pytesseract)
                 # نظراً لقيود البيئة، سنعتمد على النص المستخرج مباشرة من pdfplumber
                 # يمكن إضافة دعم OCR المتقدم هنا باستخدام مكتبات مثل pdf2image و pytesseract
-                
+
     except Exception as e:
         logger.error(f"Error extracting text from PDF {file_path}: {e}")
-    return full_text
+    return "\n\n".join(parts)
 
 def _extract_text_from_docx(file_path: str) -> str:
     """يستخرج النص من ملف DOCX."""
@@ -44,7 +72,15 @@ def _extract_text_from_docx(file_path: str) -> str:
 def _extract_text_from_image(file_path: str) -> str:
     """يستخرج النص من ملف صورة باستخدام Tesseract OCR."""
     try:
-        text = pytesseract.image_to_string(Image.open(file_path), lang='ara+eng')
+        with Image.open(file_path) as img:
+            # زمن OCR يتناسب مع عدد البكسلات: نطلب من مفكك JPEG نسخة رمادية مصغرة مباشرة
+            # (draft لا يؤثر على الصيغ الأخرى)، ثم نحول للرمادي ونصغر الصور الكبيرة جداً
+            img.draft("L", (OCR_MAX_DIMENSION, OCR_MAX_DIMENSION))
+            ocr_image = img.convert("L")
+        if max(ocr_image.size) > OCR_MAX_DIMENSION:
+            ocr_image.thumbnail((OCR_MAX_DIMENSION, OCR_MAX_DIMENSION), Image.LANCZOS)
+        # --oem 1: محرك LSTM فقط (أسرع من الجمع بين المحرك القديم و LSTM)
+        text = pytesseract.image_to_string(ocr_image, lang='ara+eng', config='--oem 1')
         return text
     except pytesseract.TesseractNotFoundError:
         logger.error("Tesseract is not installed or not in your PATH. Cannot perform OCR.")
@@ -53,51 +89,104 @@ def _extract_text_from_image(file_path: str) -> str:
         logger.error(f"Error extracting text from image {file_path}: {e}")
         return ""
 
+def _detect_encoding(raw: bytes) -> str | None:
+    """يكتشف ترميز النص في تمريرة واحدة على البايتات المقروءة."""
+    if detect_charset is not None:
+        best = detect_charset(raw).best()
+        return best.encoding if best else None
+    for encoding in _FALLBACK_ENCODINGS:
+        try:
+            raw.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
 def _extract_text_from_txt(file_path: str) -> str:
     """يستخرج النص من ملف TXT."""
     try:
-        # محاولة قراءة بترميزات مختلفة
-        encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1256', 'windows-1256']
-        for encoding in encodings:
+        # قراءة الملف مرة واحدة ثم اكتشاف الترميز من البايتات بدلاً من تجربة كل ترميز بقراءة جديدة
+        stat = os.stat(file_path)
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+
+        cache_key = (file_path, stat.st_mtime_ns, stat.st_size)
+        encoding = _ENCODING_CACHE.get(cache_key)
+        if encoding is None:
+            encoding = _detect_encoding(raw)
+            if encoding:
+                _ENCODING_CACHE[cache_key] = encoding
+                if len(_ENCODING_CACHE) > _ENCODING_CACHE_MAX:
+                    _ENCODING_CACHE.popitem(last=False)
+        else:
+            _ENCODING_CACHE.move_to_end(cache_key)
+
+        if encoding:
             try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
-            except UnicodeDecodeError:
-                continue
-        # إذا فشلت جميع الترميزات، استخدم utf-8 مع errors='ignore'
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
+                return raw.decode(encoding)
+            except (UnicodeDecodeError, LookupError):
+                pass
+        # إذا فشل اكتشاف الترميز، استخدم utf-8 مع errors='ignore'
+        return raw.decode('utf-8', errors='ignore')
     except Exception as e:
         logger.error(f"Error extracting text from TXT {file_path}: {e}")
         return ""
 
+# ربط امتداد الملف بدالة الاستخراج المناسبة (بحث واحد في القاموس بدلاً من سلسلة endswith)
+EXTRACTORS = {
+    ".pdf": _extract_text_from_pdf,
+    ".docx": _extract_text_from_docx,
+    ".doc": _extract_text_from_docx,
+    ".txt": _extract_text_from_txt,
+    ".jpg": _extract_text_from_image,
+    ".jpeg": _extract_text_from_image,
+    ".png": _extract_text_from_image,
+    ".tiff": _extract_text_from_image,
+}
+
 def process_document(file_path: str) -> Document | None:
     """
     يعالج ملفاً واحداً ويستخرج منه النص لإنشاء كائن Document.
     يدعم PDF، DOCX، DOC، TXT، والصور (JPG, PNG, TIFF).
     """
     filename = os.path.basename(file_path)
-    full_text = ""
-    
-    if filename.lower().endswith((".pdf")):
-        full_text = _extract_text_from_pdf(file_path)
-    elif filename.lower().endswith((".docx", ".doc")):
-        full_text = _extract_text_from_docx(file_path)
-    elif filename.lower().endswith((".txt")):
-        full_text = _extract_text_from_txt(file_path)
-    elif filename.lower().endswith((".jpg", ".jpeg", ".png", ".tiff")):
-        full_text = _extract_text_from_image(file_path)
-    else:
+    extractor = EXTRACTORS.get(os.path.splitext(filename)[1].lower())
+    if extractor is None:
         logger.warning(f"Unsupported file type for ingestion: {filename}")
         return None
+
+    # إعادة الفهرسة لا تعيد OCR/تحليل الملفات التي لم يتغير محتواها: المفتاح هو بصمة BLAKE2b للبايتات
+    with open(file_path, 'rb') as f:
+        content_hash = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+    cache_key = f"doc:{content_hash}"
+    cached = cache_manager.get(cache_key)
+    if isinstance(cached, dict) and cached.get("text"):
+        return Document(page_content=cached["text"], metadata={"source": filename})
+
+    full_text = extractor(file_path)
         
     if full_text and full_text.strip():
+        # كتابة متزامنة: هذه الدالة تعمل غالباً داخل عمليات ProcessPoolExecutor حيث لا يوجد خيط الكتابة الخلفي
+        # (النص يُغلف في قاموس حتى لا يُفسَّر محتوى يشبه JSON عند القراءة)
+        cache_manager.set_sync(cache_key, {"text": full_text}, ttl_seconds=DOC_CACHE_TTL)
         # إضافة معالجة الجداول المتقدمة هنا إذا لزم الأمر (يتطلب مكتبات إضافية مثل camelot أو tabula)
         # حالياً، يتم الاعتماد على النص المستخرج، والذي يجب أن يتضمن الجداول كنص عادي.
         return Document(page_content=full_text, metadata={"source": filename})
     
     return None
 
+def _collect_document(loaded_docs: List[Document], filename: str, doc: Document | None) -> None:
+    """يضيف المستند الناتج إلى القائمة بعد التحقق من أن محتواه غير فارغ."""
+    if doc:
+        # التحقق من أن النص غير فارغ
+        if doc.page_content and doc.page_content.strip():
+            logger.info(f"Successfully processed {filename} - Content length: {len(doc.page_content)} characters")
+            loaded_docs.append(doc)
+        else:
+            logger.warning(f"File {filename} produced empty content")
+    else:
+        logger.warning(f"Failed to process {filename}")
+
 def ingest_all_documents(data_dir: str) -> List[Document]:
     """يفهرس جميع المستندات المدعومة في مجلد البيانات."""
     loaded_docs = []
@@ -107,26 +196,29 @@ def ingest_all_documents(data_dir: str) -> List[Document]:
         logger.error(f"Data directory does not exist: {data_dir}")
         return loaded_docs
     
-    files = os.listdir(data_dir)
-    logger.info(f"Found {len(files)} files in directory")
-    
-    for filename in files:
-        file_path = os.path.join(data_dir, filename)
-        if os.path.isfile(file_path):
+    # os.scandir يعيد نوع الملف من قراءة المجلد نفسها دون stat() منفصل لكل ملف
+    with os.scandir(data_dir) as entries:
+        paths = {entry.path: entry.name for entry in entries if entry.is_file()}
+    logger.info(f"Found {len(paths)} files in directory")
+
+    if INGEST_WORKERS <= 1 or len(paths) <= 1:
+        for file_path, filename in paths.items():
             logger.info(f"Processing file: {filename}")
             try:
-                doc = process_document(file_path)
-                if doc:
-                    # التحقق من أن النص غير فارغ
-                    if doc.page_content and doc.page_content.strip():
-                        logger.info(f"Successfully processed {filename} - Content length: {len(doc.page_content)} characters")
-                        loaded_docs.append(doc)
-                    else:
-                        logger.warning(f"File {filename} produced empty content")
-                else:
-                    logger.warning(f"Failed to process {filename}")
+                _collect_document(loaded_docs, filename, process_document(file_path))
             except Exception as e:
                 logger.error(f"Error processing {filename}: {e}", exc_info=True)
+    else:
+        # استخراج النص (PDF/OCR) عمل حسابي مقيد بالـ GIL، لذا نوزعه على عدة عمليات
+        logger.info(f"Processing {len(paths)} files with {INGEST_WORKERS} worker processes")
+        with ProcessPoolExecutor(max_workers=min(INGEST_WORKERS, len(paths)), mp_context=_INGEST_MP_CONTEXT) as executor:
+            futures = {executor.submit(process_document, file_path): filename for file_path, filename in paths.items()}
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    _collect_document(loaded_docs, filename, future.result())
+                except Exception as e:
+                    logger.error(f"Error processing {filename}: {e}", exc_info=True)
     
     logger.info(f"Total documents loaded: {len(loaded_docs)}")
     return loaded_docs
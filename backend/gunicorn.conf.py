@@ -0,0 +1,51 @@
+"""
+إعدادات Gunicorn لتشغيل FastAPI بعدة عمليات (UvicornWorker).
+عدد العمليات يُقرأ من WEB_CONCURRENCY أو UVICORN_WORKERS، وإلا عدد أنوية المعالج.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def _env_int(*names: str) -> int | None:
+    """أول متغير بيئة غير فارغ من القائمة كعدد صحيح (القيمة الفارغة تُعامل كغير مضبوطة)."""
+    for name in names:
+        value = os.getenv(name, "").strip()
+        if value:
+            return int(value)
+    return None
+
+
+workers = _env_int("WEB_CONCURRENCY", "UVICORN_WORKERS") or multiprocessing.cpu_count()
+# RotatingFileHandler لا يدعم عدة عمليات تكتب وتدوّر الملف نفسه؛ كل عملية تكتب ملفها app.<pid>.log
+if workers > 1:
+    os.environ["LOG_FILE_PER_PROCESS"] = "1"
+# ميزانية اتصالات PostgreSQL لكل الخدمة (أقل من max_connections=100 الافتراضي مع هامش للإدارة)
+# تُقسم على العمليات ثم بالتساوي بين المحرك المتزامن وغير المتزامن (pool + overflow لكل منهما).
+# أي قيمة DB_* مضبوطة صراحة في البيئة تُحترم كما هي.
+DB_CONNECTION_BUDGET = _env_int("DB_CONNECTION_BUDGET") or 80
+_per_engine_slot = max(1, DB_CONNECTION_BUDGET // workers // 4)
+for _name in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_ASYNC_POOL_SIZE", "DB_ASYNC_MAX_OVERFLOW"):
+    if not os.getenv(_name, "").strip():
+        os.environ[_name] = str(_per_engine_slot)
+
+# ملف نبض العمليات في الذاكرة بدلاً من القرص (يتجنب توقف العمليات عند بطء القرص في الحاويات)
+worker_tmp_dir = "/dev/shm"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    """
+    تهيئة قاعدة البيانات مرة واحدة في العملية الرئيسية قبل إنشاء العمليات الفرعية.
+    استيراد database يشغّل init_db() هنا، ثم يُضبط SKIP_DB_INIT=1 فيتخطاها كل من
+    database.py و main.py في العمليات الفرعية، سواء ورثت الوحدة بعد fork أو أعادت استيرادها.
+    """
+    import database
+
+    # عدم توريث اتصالات مفتوحة إلى العمليات الفرعية بعد fork
+    database.ENGINE.dispose()
+    os.environ["SKIP_DB_INIT"] = "1"
@@ -1,6 +1,23 @@
+import atexit
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
+
+# مستمع الطابور الذي يكتب ملف السجل في خيط خلفي (يُحفظ لإيقافه عند إعادة الإعداد)
+_file_listener: logging.handlers.QueueListener | None = None
+
+
+def _stop_file_listener():
+    """إيقاف خيط كتابة ملف السجل بعد تفريغ الرسائل المتبقية."""
+    global _file_listener
+    if _file_listener is not None:
+        _file_listener.stop()
+        _file_listener = None
+
+
+atexit.register(_stop_file_listener)
 
 def setup_logging(log_level=logging.INFO):
     """
@@ -11,13 +28,25 @@ def setup_logging(log_level=logging.INFO):
     # التأكد من وجود مجلد logs
     log_dir = os.getenv("LOG_DIR", "/app/logs")
     os.makedirs(log_dir, exist_ok=True)
-    log_file_path = os.path.join(log_dir, "app.log")
+    # مع عدة عمليات (gunicorn) لكل عملية ملفها الخاص، فالتدوير لا يعيد تسمية ملف تكتب فيه عملية أخرى
+    if os.getenv("LOG_FILE_PER_PROCESS") == "1":
+        log_file_path = os.path.join(log_dir, f"app.{os.getpid()}.log")
+    else:
+        log_file_path = os.path.join(log_dir, "app.log")
+
+    # معلومات المستدعي (module:lineno) تظهر في وضع DEBUG فقط
+    debug_mode = log_level <= logging.DEBUG
+    formatter_name = "debug" if debug_mode else "standard"
 
     LOGGING_CONFIG = {
         "version": 1,
         "disable_existing_loggers": False,
         "formatters": {
             "standard": {
+                "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                "datefmt": "%Y-%m-%d %H:%M:%S",
+            },
+            "debug": {
                 "format": "%(asctime)s - %(name)s - %(levelname)s - %(module)s:%(lineno)d - %(message)s",
                 "datefmt": "%Y-%m-%d %H:%M:%S",
             },
@@ -25,21 +54,13 @@ def setup_logging(log_level=logging.INFO):
         "handlers": {
             "console": {
                 "class": "logging.StreamHandler",
-                "formatter": "standard",
+                "formatter": formatter_name,
                 "level": log_level,
             },
-            "file": {
-                "class": "logging.handlers.RotatingFileHandler",
-                "formatter": "standard",
-                "filename": log_file_path,
-                "maxBytes": 1024 * 1024 * 5,  # 5 MB
-                "backupCount": 5,
-                "level": logging.WARNING, # سجل التحذيرات والأخطاء فقط في الملف
-            },
         },
         "loggers": {
             "": {  # Root logger
-                "handlers": ["console", "file"],
+                "handlers": ["console"],
                 "level": log_level,
                 "propagate": True,
             },
@@ -57,6 +78,28 @@ def setup_logging(log_level=logging.INFO):
     }
 
     logging.config.dictConfig(LOGGING_CONFIG)
+
+    # ملف السجل يُكتب عبر QueueHandler/QueueListener حتى لا يحجب إدخال/إخراج القرص
+    # (والتدوير) خيط الطلب؛ الكتابة الفعلية تتم في خيط خلفي
+    global _file_listener
+    _stop_file_listener()
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file_path,
+        maxBytes=1024 * 1024 * 5,  # 5 MB
+        backupCount=5,
+        encoding="utf-8",
+    )
+    file_handler.setLevel(logging.WARNING)  # سجل التحذيرات والأخطاء فقط في الملف
+    file_handler.setFormatter(logging.Formatter(
+        LOGGING_CONFIG["formatters"][formatter_name]["format"],
+        datefmt=LOGGING_CONFIG["formatters"][formatter_name]["datefmt"],
+    ))
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setLevel(logging.WARNING)
+    logging.getLogger().addHandler(queue_handler)
+    _file_listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _file_listener.start()
     
     # اختبار التسجيل
     logger = logging.getLogger(__name__)
@@ -1,21 +1,37 @@
 import os
 import sys
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Query
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, status, Request, Query
 import logging
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Row, exists, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Annotated, Dict, Any, Optional
-from pydantic import BaseModel, Field, field_validator
+from typing import Annotated, Any, Dict, List, Optional
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 # إضافة مسار backend إلى sys.path للسماح بالاستيراد المطلق
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # استيراد الخدمات والنماذج
 from logging_config import setup_logging
-from database import get_users_session, get_progress_session, get_notifications_session, init_db, ChatMessage
-from security import get_current_user, get_current_admin_user
+from database import (
+    get_users_session,
+    get_progress_session,
+    get_notifications_session,
+    get_async_users_session,
+    get_async_progress_session,
+    get_async_notifications_session,
+    init_db,
+    get_chat_history,
+    ChatMessage,
+    SessionLocal,
+)
+from security import get_current_user, get_current_admin_user, get_password_hash
+from cache_manager import bind_request_batcher, reset_request_batcher
 from security_middleware import (
     RateLimitMiddleware,
     SecurityHeadersMiddleware,
@@ -25,7 +41,7 @@ from security_middleware import (
     InputSanitizationMiddleware,
     AuditLoggingMiddleware,
     sanitize_string,
-    validate_user_id,
+    USER_ID_RE,
 )
 from services import users_service, progress_service, notifications_service, documents_service, graph_service, llm_service
 from services.users_service import StudentCreate, AdminCreate, UserLogin, Token
@@ -43,13 +59,29 @@ app = FastAPI(
     title="Smart Academic Advisor API Gateway",
     description="API Gateway and Request Router for the Microservices-based Academic Advisor System.",
     version="1.0.0",
+    # orjson (C) بدلاً من json القياسي لترميز الاستجابات، ويدعم datetime مباشرة
+    default_response_class=ORJSONResponse,
     swagger_ui_init_oauth={
         "usePkceWithAuthorizationCodeGrant": False,
     },
 )
 
-# تهيئة قواعد البيانات
-init_db()
+# تهيئة قواعد البيانات (تُتخطى عند تشغيلها مسبقاً مرة واحدة، مثل on_starting في gunicorn.conf.py)
+if os.getenv("SKIP_DB_INIT") != "1":
+    init_db()
+
+# تجميع قراءات الكاش خلال الطلب الواحد في MGET واحد (نمط dataloader)
+# ملاحظة: يُسجَّل قبل باقي الوسطاء ليكون الأقرب إلى المسارات
+@app.middleware("http")
+async def cache_batching_middleware(request: Request, call_next):
+    batcher, token = bind_request_batcher()
+    request.state.cache_batcher = batcher
+    try:
+        response = await call_next(request)
+        await batcher.flush()
+        return response
+    finally:
+        reset_request_batcher(token)
 
 # إعداد CORS
 origins = [
@@ -68,7 +100,8 @@ app.add_middleware(
 )
 app.add_middleware(AuditLoggingMiddleware)
 app.add_middleware(SecurityHeadersMiddleware)
-app.add_middleware(InputSanitizationMiddleware)
+# جسم /chat يُنظف داخل ChatRequest (sanitize_string + validate_user_id)
+app.add_middleware(InputSanitizationMiddleware, skip_paths={"/chat"})
 app.add_middleware(
     JWTAuthMiddleware,
     protected_paths=(
@@ -90,6 +123,9 @@ app.add_middleware(RateLimitMiddleware)
 
 class ChatRequest(BaseModel):
     """Chat request model with input validation / نموذج طلب الدردشة مع التحقق من المدخلات"""
+    # القص وحد الطول يُنفذان داخل pydantic-core قبل المدققات
+    model_config = ConfigDict(str_strip_whitespace=True, str_max_length=2000)
+
     question: str = Field(..., min_length=1, max_length=2000, description="User question / سؤال المستخدم")
     user_id: str = Field(..., min_length=1, max_length=50, description="User ID for personalized context / معرف المستخدم للسياق الشخصي")
     
@@ -97,7 +133,7 @@ class ChatRequest(BaseModel):
     @classmethod
     def validate_question(cls, v):
         """Sanitize and validate question input"""
-        if not v or not v.strip():
+        if not v:
             raise ValueError("Question cannot be empty")
         return sanitize_string(v, max_length=2000)
     
@@ -105,7 +141,7 @@ class ChatRequest(BaseModel):
     @classmethod
     def validate_user_id(cls, v):
         """Validate user_id format"""
-        if not validate_user_id(v):
+        if USER_ID_RE.fullmatch(v) is None:
             raise ValueError("Invalid user_id format")
         return v
 
@@ -136,58 +172,44 @@ class SyncDataRequest(BaseModel):
 # Helpers / وظائف مساعدة
 # ------------------------------------------------------------
 
-def _get_chat_history(db_session: Session, user_id: str, limit: int = 10):
-    """Fetch latest chat messages for the given user."""
-    records = (
-        db_session.query(ChatMessage)
-        .filter(ChatMessage.user_id == user_id)
-        .order_by(ChatMessage.created_at.desc())
-        .limit(limit)
-        .all()
-    )
-    return list(reversed(records))
-
-
-def _serialize_chat_history(records):
-    history = []
-    for record in records:
-        history.append(
-            {
-                "role": record.role,
-                "content": record.content,
-                "intent": record.intent,
-                "timestamp": record.created_at.isoformat() if record.created_at else None,
-            }
-        )
-    return history
+def _serialize_chat_history(records: List[Row]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "role": role,
+            "content": content,
+            "intent": intent,
+            "timestamp": created_at,
+        }
+        for role, content, intent, created_at in records
+    ]
 
 
-def _persist_chat_exchange(db_session: Session, user_id: str, question: str, answer: str, intent: Optional[str]):
-    """Store the user/assistant messages for conversation continuity."""
+def _persist_chat_exchange(user_id: str, question: str, answer: str, intent: Optional[str]) -> None:
+    """
+    Store the user/assistant messages for conversation continuity.
+    Runs as a background task after the response is sent, so it opens its own session
+    (the request-scoped one is already closed by then).
+    """
+    db_session = SessionLocal()
     try:
-        user_msg = ChatMessage(
-            user_id=user_id,
-            role="user",
-            content=question,
-            intent=intent,
-        )
-        assistant_msg = ChatMessage(
-            user_id=user_id,
-            role="assistant",
-            content=answer,
-            intent=intent,
-        )
-        db_session.add_all([user_msg, assistant_msg])
+        # صفا المحادثة في جملة INSERT ... VALUES (...), (...) واحدة
+        # (values() بقائمة وليس executemany الذي ينفذ جملتين مع psycopg)
+        db_session.execute(insert(ChatMessage).values([
+            {"user_id": user_id, "role": "user", "content": question, "intent": intent},
+            {"user_id": user_id, "role": "assistant", "content": answer, "intent": intent},
+        ]))
         db_session.commit()
     except Exception:
         db_session.rollback()
         logger.exception("Failed to persist chat exchange for user %s", user_id)
+    finally:
+        db_session.close()
 
 # ------------------------------------------------------------
 # مسارات الأمان (Authentication & Authorization)
 # ------------------------------------------------------------
 
-@app.post("/register/student", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
+@app.post("/register/student", status_code=status.HTTP_201_CREATED)
 def register_student(student_data: StudentCreate, db: Annotated[Session, Depends(get_users_session)]):
     """تسجيل طالب جديد (يتطلب التحقق من النظام الجامعي)."""
     logger.info(f"Attempting to register student: {student_data.user_id}")
@@ -202,7 +224,7 @@ def register_student(student_data: StudentCreate, db: Annotated[Session, Depends
         logger.error(f"Unexpected error during student registration: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="خطأ داخلي في تسجيل الطالب")
 
-@app.post("/register/admin", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
+@app.post("/register/admin", status_code=status.HTTP_201_CREATED)
 def register_admin(
     admin_data: AdminCreate,
     current_admin: Annotated[users_service.User, Depends(get_current_admin_user)],
@@ -221,15 +243,20 @@ def register_admin(
         logger.error(f"Unexpected error during admin creation: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="خطأ داخلي في إنشاء حساب الأدمن")
 
-@app.post("/register/admin/initial", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
-def register_initial_admin(
+@app.post("/register/admin/initial", status_code=status.HTTP_201_CREATED)
+async def register_initial_admin(
     admin_data: AdminCreate,
-    db: Annotated[Session, Depends(get_users_session)]
+    db: Annotated[AsyncSession, Depends(get_async_users_session)]
 ):
     """إنشاء حساب أدمن أولي (فقط إذا لم يكن هناك أدمن موجود)."""
-    # التحقق من وجود أدمن موجود
-    existing_admin = db.query(users_service.User).filter(users_service.User.role == "admin").first()
-    if existing_admin:
+    User = users_service.User
+    # التحقق من وجود أدمن ومن تكرار المعرف/البريد في استعلام واحد
+    checks = (await db.execute(select(
+        exists().where(User.role == "admin").label("has_admin"),
+        exists().where(User.user_id == admin_data.user_id).label("dup_id"),
+        exists().where(User.email == admin_data.email).label("dup_email"),
+    ))).one()
+    if checks.has_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="يوجد أدمن موجود بالفعل. يجب تسجيل الدخول كأدمن لإنشاء حسابات جديدة."
@@ -238,20 +265,16 @@ def register_initial_admin(
     logger.warning(f"Creating initial admin account: {admin_data.user_id}")
     try:
         # إنشاء حساب الأدمن مباشرة بدون الحاجة لموافقة
-        from security import get_password_hash
-        
-        # التحقق من أن المعرف غير مستخدم
-        if db.query(users_service.User).filter(users_service.User.user_id == admin_data.user_id).first():
+        if checks.dup_id:
             raise HTTPException(status_code=400, detail="معرف المستخدم مسجل بالفعل")
         
-        # التحقق من أن البريد الإلكتروني غير مستخدم
-        if db.query(users_service.User).filter(users_service.User.email == admin_data.email).first():
+        if checks.dup_email:
             raise HTTPException(status_code=400, detail="البريد الإلكتروني مسجل بالفعل")
         
-        # تشفير كلمة المرور
-        hashed_password = get_password_hash(admin_data.password)
+        # تشفير كلمة المرور (bcrypt مكلف لذا يُنفذ خارج حلقة الأحداث)
+        hashed_password = await run_in_threadpool(get_password_hash, admin_data.password)
         
-        db_user = users_service.User(
+        db_user = User(
             user_id=admin_data.user_id,
             full_name=admin_data.full_name,
             email=admin_data.email,
@@ -260,8 +283,12 @@ def register_initial_admin(
             role="admin"
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # طلب متزامن سجّل نفس المعرف/البريد بعد التحقق (القيود الفريدة في الجدول)
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="معرف المستخدم أو البريد الإلكتروني مسجل بالفعل")
         
         logger.warning(f"Initial admin created successfully: {db_user.user_id}")
         return {
@@ -275,7 +302,7 @@ def register_initial_admin(
         raise e
     except Exception as e:
         logger.error(f"Unexpected error during initial admin creation: {e}", exc_info=True)
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="خطأ داخلي في إنشاء حساب الأدمن الأولي")
 
 @app.post("/token", response_model=Token)
@@ -325,7 +352,7 @@ def login_for_access_token_json(
             detail="حدث خطأ غير متوقع أثناء تسجيل الدخول"
         )
 
-@app.get("/users/me", response_model=Dict[str, Any])
+@app.get("/users/me")
 def read_users_me(current_user: Annotated[users_service.User, Depends(get_current_user)]):
     """الحصول على معلومات المستخدم الحالي (مسار محمي)."""
     result = {
@@ -338,7 +365,7 @@ def read_users_me(current_user: Annotated[users_service.User, Depends(get_curren
         result["is_demo"] = current_user.is_demo
     return result
 
-@app.post("/users/sync-data", response_model=Dict[str, Any])
+@app.post("/users/sync-data")
 def sync_student_data(
     sync_request: SyncDataRequest,
     current_user: Annotated[users_service.User, Depends(get_current_user)],
@@ -388,12 +415,13 @@ def sync_student_data(
 # ------------------------------------------------------------
 
 # مسار الدردشة (محمي)
-@app.post("/chat", response_model=Dict[str, Any])
+@app.post("/chat")
 async def chat_with_advisor(
     chat_request: ChatRequest,
     current_user: Annotated[users_service.User, Depends(get_current_user)],
-    db_users: Annotated[Session, Depends(get_users_session)],
-    db_progress: Annotated[Session, Depends(get_progress_session)],
+    background_tasks: BackgroundTasks,
+    db_chat: Annotated[AsyncSession, Depends(get_async_users_session)],
+    db_progress: Annotated[AsyncSession, Depends(get_async_progress_session)],
     db_notifications: Annotated[Session, Depends(get_notifications_session)],
 ):
     """
@@ -403,8 +431,9 @@ async def chat_with_advisor(
     Args:
         chat_request: Chat request with question and user_id
         current_user: Authenticated user from JWT token
-        db_users: Users database session
-        db_progress: Progress database session
+        background_tasks: Post-response tasks (chat persistence)
+        db_chat: Async users database session (chat history)
+        db_progress: Async progress database session
         db_notifications: Notifications database session
         
     Returns:
@@ -436,15 +465,15 @@ async def chat_with_advisor(
     try:
         chat_history_records = []
         if not is_demo:
-            chat_history_records = _get_chat_history(db_users, current_user.user_id, limit=10)
+            chat_history_records = await get_chat_history(db_chat, current_user.user_id, limit=10)
         chat_history = _serialize_chat_history(chat_history_records)
 
         # إعداد الخدمات
         services = {
             "documents": documents_service,
             "progress": progress_service,
+            # تحليل التقدم يُجرى داخل llm_service فقط عندما تكون النية analyze_progress
             "progress_db": db_progress,
-            "users_db": db_users,
             "graph": graph_service
         }
         
@@ -470,8 +499,9 @@ async def chat_with_advisor(
         logger.info(f"Chat response generated for user {current_user.user_id}. Intent: {response.get('intent')}")
 
         if not is_demo and response_obj.intent != "clarify":
-            _persist_chat_exchange(
-                db_users,
+            # الحفظ بعد إرسال الاستجابة حتى لا ينتظر المستخدم رحلة قاعدة البيانات
+            background_tasks.add_task(
+                _persist_chat_exchange,
                 current_user.user_id,
                 chat_request.question,
                 response_obj.answer,
@@ -494,25 +524,24 @@ async def chat_with_advisor(
         )
 
 # مسارات تقدم الطلاب (محمية)
-@app.post("/progress/record", response_model=Dict[str, Any])
-def record_progress(
+@app.post("/progress/record")
+async def record_progress(
     record: ProgressRecordCreate,
     current_user: Annotated[users_service.User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_progress_session)],
+    db: Annotated[AsyncSession, Depends(get_async_progress_session)],
 ):
     """تسجيل مقرر مكتمل (محمي)."""
     if record.user_id != current_user.user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot record progress for another user")
     
     logger.info(f"Recording progress for user {current_user.user_id}: {record.course_code}")
-    return progress_service.record_progress(db, record.model_dump())
+    return await progress_service.record_progress(db, record.model_dump())
 
-@app.get("/progress/analyze/{user_id}", response_model=Dict[str, Any])
-def analyze_progress(
+@app.get("/progress/analyze/{user_id}")
+async def analyze_progress(
     user_id: str,
     current_user: Annotated[users_service.User, Depends(get_current_user)],
-    db_progress: Annotated[Session, Depends(get_progress_session)],
-    db_users: Annotated[Session, Depends(get_users_session)],
+    db_progress: Annotated[AsyncSession, Depends(get_async_progress_session)],
 ):
     """تحليل التقدم الأكاديمي (محمي)."""
     # التحقق من الوضع التجريبي
@@ -533,9 +562,9 @@ def analyze_progress(
         )
     
     logger.info(f"Analyzing progress for user {user_id}")
-    return progress_service.analyze_progress(db_progress, db_users, user_id)
+    return await progress_service.analyze_progress_async(db_progress, user_id)
 
-@app.post("/progress/simulate-gpa", response_model=Dict[str, Any])
+@app.post("/progress/simulate-gpa")
 def simulate_gpa(
     simulation_request: GPASimulationRequest,
     current_user: Annotated[users_service.User, Depends(get_current_user)],
@@ -550,21 +579,21 @@ def simulate_gpa(
     )
 
 # مسارات الإشعارات (محمية)
-@app.get("/notifications/{user_id}", response_model=list[Dict[str, Any]])
-def get_user_notifications(
+@app.get("/notifications/{user_id}")
+async def get_user_notifications(
     user_id: str,
     current_user: Annotated[users_service.User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_notifications_session)],
+    db: Annotated[AsyncSession, Depends(get_async_notifications_session)],
 ):
     """الحصول على إشعارات المستخدم (محمي)."""
     if user_id != current_user.user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot view another user's notifications")
     
     logger.info(f"Fetching notifications for user {user_id}")
-    return notifications_service.get_notifications(db, user_id)
+    return await notifications_service.get_notifications(db, user_id)
 
 # مسارات المستندات (محمية - للإداريين فقط)
-@app.post("/documents/ingest", response_model=Dict[str, Any])
+@app.post("/documents/ingest")
 def ingest_documents_route(current_admin: Annotated[users_service.User, Depends(get_current_admin_user)]):
     """فهرسة المستندات (محمي للإداريين)."""
     logger.warning(f"Admin user {current_admin.user_id} is initiating document ingestion.")
@@ -575,7 +604,7 @@ def ingest_documents_route(current_admin: Annotated[users_service.User, Depends(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error during document ingestion")
 
 # مسارات الرسم البياني (محمية - للإداريين فقط)
-@app.post("/graph/ingest", response_model=Dict[str, Any])
+@app.post("/graph/ingest")
 def ingest_graph_data_route(current_admin: Annotated[users_service.User, Depends(get_current_admin_user)]):
     """فهرسة بيانات الرسم البياني (محمي للإداريين)."""
     logger.warning(f"Admin user {current_admin.user_id} is initiating graph data ingestion.")
@@ -585,7 +614,7 @@ def ingest_graph_data_route(current_admin: Annotated[users_service.User, Depends
         logger.error(f"Error during graph data ingestion: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error during graph data ingestion")
 
-@app.get("/graph/skills/{course_code}", response_model=Dict[str, Any])
+@app.get("/graph/skills/{course_code}")
 def get_skills_for_course_route(course_code: str, current_user: Annotated[users_service.User, Depends(get_current_user)]):
     """الحصول على المهارات لمقرر معين (محمي)."""
     logger.info(f"User {current_user.user_id} querying skills for course {course_code}")
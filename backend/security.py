@@ -18,6 +18,7 @@ This module handles all security-related operations:
 
 import os
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Annotated
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
@@ -42,7 +43,8 @@ ACCESS_TOKEN_EXPIRE_MINUTES = get_config("security", {}).get("access_token_expir
 
 # إعدادات تشفير كلمة المرور
 # استخدام bcrypt مباشرة لتجنب مشاكل التوافق مع passlib
-BCRYPT_ROUNDS = 12
+# عامل التكلفة قابل للضبط (مثلاً 10 في بيئة الاختبار و 12 في الإنتاج)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
 # إعداد OAuth2
 # ملاحظة: tokenUrl يجب أن يكون مسار كامل أو نسبي
@@ -68,12 +70,21 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         True if password matches, False otherwise
         / True إذا تطابقت كلمة المرور، False خلاف ذلك
     """
-    if isinstance(hashed_password, str):
-        hashed_password = hashed_password.encode('utf-8')
     if isinstance(plain_password, str):
         plain_password = plain_password.encode('utf-8')
+    if not hashed_password:
+        # لا يوجد hash مخزن: مقارنة مع hash وهمي بنفس التكلفة حتى لا يكشف زمن الاستجابة ذلك
+        bcrypt.checkpw(plain_password, _dummy_hash())
+        return False
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode('utf-8')
     return bcrypt.checkpw(plain_password, hashed_password)
 
+@lru_cache(maxsize=1)
+def _dummy_hash() -> bytes:
+    """Hash computed once with the configured cost / يُحسب مرة واحدة بنفس التكلفة المضبوطة."""
+    return bcrypt.hashpw(b"dummy-password", bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
 def get_password_hash(password: str) -> str:
     """
     Hash password using bcrypt.
@@ -23,8 +23,7 @@ import time
 import re
 import json
 import logging
-from collections import defaultdict
-from typing import Dict, Tuple, Sequence
+from typing import Any, Dict, Optional, Tuple, Sequence
 
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
@@ -48,11 +47,18 @@ RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
 
 
 class RedisRateLimiter:
-    """داعم تحديد المعدل باستخدام Redis مع دعم احتياطي في الذاكرة."""
+    """
+    Fixed-window rate limiter shared across workers through Redis.
+    / محدد معدل بنافذة ثابتة مشترك بين العمليات عبر Redis.
+
+    Each key is bucketed by window (e.g. per minute), so counters expire on their own.
+    The in-memory counter is only used when Redis is unavailable.
+    / العداد في الذاكرة يُستخدم فقط عند عدم توفر Redis.
+    """
 
-    def __init__(self):
+    def __init__(self) -> None:
         self._redis_url = RATE_LIMIT_REDIS_URL
-        self._redis = None
+        self._redis: Any = None
         if self._redis_url and aioredis:
             try:
                 self._redis = aioredis.from_url(
@@ -67,38 +73,40 @@ class RedisRateLimiter:
         else:
             if not aioredis:
                 logger.warning("redis package not available; falling back to in-memory rate limiting.")
-        self._local_counts: Dict[str, list] = defaultdict(list)
+        # عدادات النافذة الحالية فقط (تُمسح عند بدء نافذة جديدة)
+        self._local_window = 0
+        self._local_counts: Dict[str, int] = {}
 
-    async def _redis_check(self, key: str, limit: int, window: int) -> bool:
-        if not self._redis:
-            return True
+    async def _redis_check(self, key: str, limit: int, window: int, bucket: int) -> Optional[bool]:
+        """Returns None when Redis is unavailable so the caller can fall back."""
         try:
-            current = await self._redis.incr(key)
-            if current == 1:
-                await self._redis.expire(key, window)
-            if current > limit:
-                return False
-            return True
+            # INCR + EXPIRE في رحلة واحدة (بدون MULTI) ومفتاح لكل نافذة
+            pipe = self._redis.pipeline(transaction=False)
+            bucket_key = f"rl:{key}:{bucket}"
+            pipe.incr(bucket_key)
+            pipe.expire(bucket_key, window)
+            current, _ = await pipe.execute()
+            return current <= limit
         except Exception as exc:  # pragma: no cover - redis failure
             logger.error(f"Redis rate limiter error: {exc}. Falling back to in-memory limiter.")
             self._redis = None
-            return True
+            return None
 
-    def _local_check(self, key: str, limit: int, window: int) -> bool:
-        current_time = time.time()
-        bucket = self._local_counts[key]
-        self._local_counts[key] = [req_time for req_time in bucket if current_time - req_time < window]
-        if len(self._local_counts[key]) >= limit:
-            return False
-        self._local_counts[key].append(current_time)
-        return True
+    def _local_check(self, key: str, limit: int, bucket: int) -> bool:
+        if bucket != self._local_window:
+            self._local_window = bucket
+            self._local_counts.clear()
+        current = self._local_counts.get(key, 0) + 1
+        self._local_counts[key] = current
+        return current <= limit
 
     async def is_allowed(self, key: str, limit: int, window: int) -> bool:
+        bucket = int(time.time()) // window
         if self._redis:
-            allowed = await self._redis_check(key, limit, window)
-            if not allowed:
-                return False
-        return self._local_check(key, limit, window)
+            allowed = await self._redis_check(key, limit, window, bucket)
+            if allowed is not None:
+                return allowed
+        return self._local_check(key, limit, bucket)
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
@@ -188,8 +196,9 @@ class JWTAuthMiddleware(BaseHTTPMiddleware):
 
     def __init__(self, app, protected_paths: Sequence[str] | None = None):
         super().__init__(app)
-        self.protected_paths = protected_paths or []
-        self.excluded_paths = {
+        # tuple حتى يتم الفحص باستدعاء str.startswith واحد (مُنفذ بلغة C)
+        self.protected_paths = tuple(protected_paths or ())
+        self.excluded_paths = frozenset({
             "/token",
             "/token/json",
             "/register/student",
@@ -198,12 +207,12 @@ class JWTAuthMiddleware(BaseHTTPMiddleware):
             "/health",
             "/docs",
             "/openapi.json",
-        }
+        })
 
     def _requires_auth(self, path: str) -> bool:
         if path in self.excluded_paths:
             return False
-        return any(path.startswith(prefix) for prefix in self.protected_paths)
+        return path.startswith(self.protected_paths)
 
     async def dispatch(self, request: Request, call_next):
         path = request.url.path
@@ -300,8 +309,16 @@ class WAFMiddleware(BaseHTTPMiddleware):
 class InputSanitizationMiddleware(BaseHTTPMiddleware):
     """
     Sanitize inputs after authentication to avoid wasting resources on unauthenticated users.
+
+    skip_paths: routes whose request models already sanitize their own fields
+    (e.g. ChatRequest), so the JSON body is not parsed and re-encoded twice.
+    / المسارات التي تنظف نماذجها مدخلاتها بنفسها، لتجنب معالجة الجسم مرتين.
     """
 
+    def __init__(self, app, skip_paths: Sequence[str] | None = None):
+        super().__init__(app)
+        self.skip_paths = frozenset(skip_paths or ())
+
     async def dispatch(self, request: Request, call_next):
 
         def _sanitize_payload(payload):
@@ -318,7 +335,7 @@ class InputSanitizationMiddleware(BaseHTTPMiddleware):
             sanitized_query[key] = sanitize_string(value, max_length=2000)
         request.state.sanitized_query = sanitized_query
 
-        if request.method in {"POST", "PUT", "PATCH"}:
+        if request.method in {"POST", "PUT", "PATCH"} and request.url.path not in self.skip_paths:
             raw_body = await request.body()
             if raw_body:
                 try:
@@ -363,6 +380,9 @@ class AuditLoggingMiddleware(BaseHTTPMiddleware):
 # التحقق من المدخلات وتنظيفها
 # ------------------------------------------------------------
 
+# Compiled once at import / تُترجم مرة واحدة عند الاستيراد
+USER_ID_RE = re.compile(r"[A-Za-z0-9_]{1,50}")
+
 def sanitize_string(input_str: str, max_length: int = 1000) -> str:
     """
     Sanitize string input to prevent injection attacks.
@@ -400,9 +420,9 @@ def validate_user_id(user_id: str) -> bool:
     Validate user ID format (alphanumeric and underscores only).
     / التحقق من تنسيق معرف المستخدم (أرقام وحروف وشرطة سفلية فقط).
     """
-    if not user_id or len(user_id) > 50:
+    if not user_id:
         return False
-    return bool(re.match(r'^[a-zA-Z0-9_]+$', user_id))
+    return USER_ID_RE.fullmatch(user_id) is not None
 
 
 def validate_email(email: str) -> bool:
@@ -14,7 +14,7 @@ import os
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 
-from cache_manager import cache_manager
+from cache_manager import cache_manager, cache_get
 
 # ------------------------------------------------------------
 # Service Connection Settings
@@ -161,7 +161,7 @@ def _hash_key(namespace: str, payload: str) -> str:
 
 async def generate_llm_response(prompt: str) -> str:
     cache_key = _hash_key("llm:response", prompt)
-    cached = cache_manager.get(cache_key)
+    cached = await cache_get(cache_key)
     if cached:
         return cached
     answer = await _client_factory.generate(prompt)
@@ -322,6 +322,7 @@ async def process_agentic_query(
         services: Dictionary of available services / قاموس الخدمات المتاحة
             - documents: Documents service for RAG
             - progress: Progress service for student analysis
+            - progress_db: Async progress database session (AsyncSession)
             - graph: Graph service for skills queries
         is_demo: Whether running in demo mode / هل يعمل في الوضع التجريبي
         
@@ -406,10 +407,9 @@ async def process_agentic_query(
             )
         
         try:
-            # استخدام analyze_progress بدلاً من analyze_student_plan
-            progress_data = services["progress"].analyze_progress(
-                services["progress_db"], 
-                services.get("users_db"), 
+            # التحليل غير المتزامن يُجرى هنا فقط، أي لنية analyze_progress وحدها
+            progress_data = await services["progress"].analyze_progress_async(
+                services["progress_db"],
                 user_id
             )
             
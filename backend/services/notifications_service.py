@@ -2,12 +2,18 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from database import Notification
-from config_manager import get_config
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from config_manager import get_config, on_config_reload
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger("NOTIFICATIONS_SERVICE")
 
 # ------------------------------------------------------------
 # نماذج Pydantic
@@ -21,40 +27,43 @@ class NotificationInDB(NotificationCreate):
     id: int
     is_read: bool
     created_at: datetime
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # ------------------------------------------------------------
 # وظائف الخدمة
 # ------------------------------------------------------------
 
 def create_notification(db: Session, notification: NotificationCreate):
-    db_notification = Notification(**notification.dict())
+    db_notification = Notification(**notification.model_dump())
     db.add(db_notification)
     db.commit()
     db.refresh(db_notification)
     return db_notification
 
-def get_notifications(db: Session, user_id: str, skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
+async def get_notifications(db: AsyncSession, user_id: str, skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
     """الحصول على إشعارات المستخدم."""
+    # أعمدة مباشرة كـ RowMapping بدون بناء كائنات ORM ثم نسخها إلى قواميس
+    stmt = (
+        select(
+            Notification.id,
+            Notification.user_id,
+            Notification.message,
+            Notification.type,
+            Notification.is_read,
+            Notification.created_at,
+        )
+        .where(Notification.user_id == user_id)
+        .order_by(Notification.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    )
     try:
-        notifications = db.query(Notification).filter(
-            Notification.user_id == user_id
-        ).order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
-        
-        return [
-            {
-                "id": notif.id,
-                "user_id": notif.user_id,
-                "message": notif.message,
-                "type": notif.type,
-                "is_read": notif.is_read,
-                "created_at": notif.created_at.isoformat() if notif.created_at else None
-            }
-            for notif in notifications
-        ]
-    except Exception as e:
-        return []
+        result = await db.execute(stmt)
+    except Exception:
+        # لا نخفي أعطال قاعدة البيانات بقائمة فارغة
+        logger.exception("Failed to fetch notifications for user %s", user_id)
+        raise
+    return [dict(row) for row in result.mappings()]
 
 def mark_notification_as_read(db: Session, notification_id: int):
     notification = db.query(Notification).filter(Notification.id == notification_id).first()
@@ -65,20 +74,38 @@ def mark_notification_as_read(db: Session, notification_id: int):
         return notification
     return None
 
-def check_gpa_warning(db: Session, user_id: str, current_gpa: float):
-    """إضافة إشعار تحذيري إذا كان المعدل التراكمي أقل من الحد المحدد في التكوين."""
+@lru_cache(maxsize=1)
+def _notifications_config() -> Tuple[float, str]:
+    """حد التحذير ونص الرسالة من التكوين (يُحسبان مرة واحدة ويُمسحان عند reload_config)."""
     config = get_config("notifications", {})
     warning_threshold = config.get("gpa_warning_threshold", 2.0)
     warning_message = config.get("low_gpa_message", f"تنبيه: معدلك التراكمي أقل من الحد الأدنى المسموح به ({warning_threshold}). يرجى مراجعة مرشدك الأكاديمي.")
+    return warning_threshold, warning_message
+
+@on_config_reload
+def reload_config():
+    """مسح إعدادات الإشعارات المخزنة مؤقتاً."""
+    _notifications_config.cache_clear()
+
+def check_gpa_warning(db: Session, user_id: str, current_gpa: float):
+    """إضافة إشعار تحذيري إذا كان المعدل التراكمي أقل من الحد المحدد في التكوين."""
+    warning_threshold, warning_message = _notifications_config()
     
     if current_gpa < warning_threshold:
-        # التحقق مما إذا كان هناك إشعار تحذيري حديث لتجنب التكرار
-        recent_alert = db.query(Notification).filter(
-            Notification.user_id == user_id,
-            Notification.type == "alert",
-            Notification.message == warning_message,
-            Notification.created_at > datetime.utcnow() - timedelta(days=7) # تحذير واحد في الأسبوع
+        # التحقق مما إذا كان هناك إشعار تحذيري حديث لتجنب التكرار (تحذير واحد في الأسبوع)
+        # الاستعلام يطابق الفهرس ix_notif_user_type_time، ومقارنة النص تتم على أحدث صف فقط
+        cutoff = datetime.utcnow() - timedelta(days=7)
+        latest_alert = db.execute(
+            select(Notification.message)
+            .where(
+                Notification.user_id == user_id,
+                Notification.type == "alert",
+                Notification.created_at > cutoff,
+            )
+            .order_by(Notification.created_at.desc())
+            .limit(1)
         ).first()
+        recent_alert = latest_alert is not None and latest_alert.message == warning_message
         
         if not recent_alert:
             create_notification(db, NotificationCreate(user_id=user_id, message=warning_message, type="alert"))
@@ -2,11 +2,13 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from database import ProgressRecord
 from config_manager import get_config
 from fastapi import HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -22,8 +24,7 @@ class ProgressRecordCreate(BaseModel):
 
 class ProgressRecordInDB(ProgressRecordCreate):
     id: int
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class StudentRecord(BaseModel):
     completed_courses: dict[str, str] # {course_code: grade}
@@ -58,13 +59,12 @@ FULL_STUDY_PLAN = {
 # وظائف الخدمة
 # ------------------------------------------------------------
 
-def record_progress(db: Session, record_data: dict):
+async def record_progress(db: AsyncSession, record_data: dict):
     """تسجيل مقرر مكتمل."""
     try:
         db_record = ProgressRecord(**record_data)
         db.add(db_record)
-        db.commit()
-        db.refresh(db_record)
+        await db.commit()
         return {
             "id": db_record.id,
             "user_id": db_record.user_id,
@@ -74,55 +74,71 @@ def record_progress(db: Session, record_data: dict):
             "semester": db_record.semester
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Error recording progress: {str(e)}")
 
 def get_student_progress(db: Session, user_id: str) -> List[ProgressRecord]:
     return db.query(ProgressRecord).filter(ProgressRecord.user_id == user_id).all()
 
+async def get_student_progress_async(db: AsyncSession, user_id: str) -> List[ProgressRecord]:
+    result = await db.execute(select(ProgressRecord).where(ProgressRecord.user_id == user_id))
+    return list(result.scalars().all())
+
 def analyze_progress(db_progress: Session, db_users: Session, user_id: str) -> Dict[str, Any]:
     """تحليل التقدم الأكاديمي للمستخدم."""
     try:
         records = get_student_progress(db_progress, user_id)
-        completed_courses = {r.course_code: r.grade for r in records}
-        
-        completed_set = set(completed_courses.keys())
-        all_courses_set = set(FULL_STUDY_PLAN["courses"].keys())
-        remaining_courses = list(all_courses_set - completed_set)
-
-        total_points = 0
-        total_hours = 0
-        for code, grade in completed_courses.items():
-            grade = grade.upper()
-            if code in FULL_STUDY_PLAN["courses"] and grade in GRADE_POINTS:
-                hours = FULL_STUDY_PLAN["courses"][code]["hours"]
-                total_points += GRADE_POINTS[grade] * hours
-                total_hours += hours
-
-        gpa = total_points / total_hours if total_hours else 0.0
-
-        registerable = []
-        for code in remaining_courses:
-            data = FULL_STUDY_PLAN["courses"].get(code, {})
-            prereqs = data.get("prereqs", [])
-            if all(p in completed_set for p in prereqs):
-                registerable.append({
-                    "code": code, 
-                    "name": data.get("name", "Unknown"), 
-                    "hours": data.get("hours", 0)
-                })
+        return _build_progress_analysis(records)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing progress: {str(e)}")
 
-        return {
-            "current_gpa": round(gpa, 2),
-            "completed_hours": total_hours,
-            "remaining_hours": FULL_STUDY_PLAN["total_hours"] - total_hours,
-            "remaining_courses_count": len(remaining_courses),
-            "registerable_next_semester": registerable,
-            "completed_courses": completed_courses
-        }
+async def analyze_progress_async(db_progress: AsyncSession, user_id: str) -> Dict[str, Any]:
+    """تحليل التقدم الأكاديمي للمستخدم (نسخة غير متزامنة لمسارات FastAPI)."""
+    try:
+        records = await get_student_progress_async(db_progress, user_id)
+        return _build_progress_analysis(records)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing progress: {str(e)}")
 
+def _build_progress_analysis(records: List[ProgressRecord]) -> Dict[str, Any]:
+    """بناء نتيجة تحليل التقدم من سجلات الطالب."""
+    completed_courses = {r.course_code: r.grade for r in records}
+    
+    completed_set = set(completed_courses.keys())
+    all_courses_set = set(FULL_STUDY_PLAN["courses"].keys())
+    remaining_courses = list(all_courses_set - completed_set)
+
+    total_points = 0
+    total_hours = 0
+    for code, grade in completed_courses.items():
+        grade = grade.upper()
+        if code in FULL_STUDY_PLAN["courses"] and grade in GRADE_POINTS:
+            hours = FULL_STUDY_PLAN["courses"][code]["hours"]
+            total_points += GRADE_POINTS[grade] * hours
+            total_hours += hours
+
+    gpa = total_points / total_hours if total_hours else 0.0
+
+    registerable = []
+    for code in remaining_courses:
+        data = FULL_STUDY_PLAN["courses"].get(code, {})
+        prereqs = data.get("prereqs", [])
+        if all(p in completed_set for p in prereqs):
+            registerable.append({
+                "code": code, 
+                "name": data.get("name", "Unknown"), 
+                "hours": data.get("hours", 0)
+            })
+
+    return {
+        "current_gpa": round(gpa, 2),
+        "completed_hours": total_hours,
+        "remaining_hours": FULL_STUDY_PLAN["total_hours"] - total_hours,
+        "remaining_courses_count": len(remaining_courses),
+        "registerable_next_semester": registerable,
+        "completed_courses": completed_courses
+    }
+
 def _calculate_current_metrics(records: List[ProgressRecord]) -> tuple[float, int]:
     total_points = 0.0
     total_hours = 0
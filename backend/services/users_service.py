@@ -5,7 +5,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from typing import Dict, Any
-from database import User, ProgressRecord, StudentAcademicInfo, RemainingCourse
+from database import User, ProgressRecord, StudentAcademicInfo, RemainingCourse, bulk_insert
 from security import get_password_hash, verify_password, create_access_token
 from datetime import timedelta, datetime
 from pydantic import BaseModel, EmailStr, Field, field_validator
@@ -95,7 +95,7 @@ def create_student(db: Session, student_data: StudentCreate) -> Dict[str, Any]:
     
     # تشفير كلمة المرور قبل الحفظ
     hashed_password = get_password_hash(student_data.password)
-    university_password = get_password_hash(student_data.password)
+    university_password = hashed_password  # نفس كلمة المرور: تكلفة bcrypt مرة واحدة
     
     db_user = User(
         user_id=student_data.user_id,
@@ -185,7 +185,11 @@ def authenticate_user(db: Session, identifier: str, password: str, allow_demo: b
     
     if user and user.role == "student":
         # التحقق من كلمة المرور المحلية أولاً
-        if verify_password(password, user.hashed_password) or verify_password(password, user.university_password or ""):
+        if verify_password(password, user.hashed_password) or (
+            user.university_password
+            and user.university_password != user.hashed_password
+            and verify_password(password, user.university_password)
+        ):
             logger.info(f"تم تسجيل دخول طالب: {user.user_id}")
             return user
         
@@ -232,7 +236,7 @@ def authenticate_user(db: Session, identifier: str, password: str, allow_demo: b
             if login_success:
                 # إنشاء حساب جديد تلقائياً
                 hashed_password = get_password_hash(password)
-                university_password = get_password_hash(password)
+                university_password = hashed_password  # نفس كلمة المرور: تكلفة bcrypt مرة واحدة
                 
                 db_user = User(
                     user_id=identifier,
@@ -261,7 +265,7 @@ def authenticate_user(db: Session, identifier: str, password: str, allow_demo: b
                 # السماح بإنشاء الحساب حتى لو فشل التحقق (للتطوير)
                 logger.warning(f"⚠️ فشل التحقق من بيانات الطالب {identifier}، لكن سيتم إنشاء الحساب")
                 hashed_password = get_password_hash(password)
-                university_password = get_password_hash(password)
+                university_password = hashed_password  # نفس كلمة المرور: تكلفة bcrypt مرة واحدة
                 
                 db_user = User(
                     user_id=identifier,
@@ -291,7 +295,7 @@ def authenticate_user(db: Session, identifier: str, password: str, allow_demo: b
             # السماح بإنشاء الحساب حتى لو فشل الاتصال (للتطوير)
             logger.warning(f"⚠️ فشل الاتصال بالنظام الجامعي، لكن سيتم إنشاء الحساب: {str(e)}")
             hashed_password = get_password_hash(password)
-            university_password = get_password_hash(password)
+            university_password = hashed_password  # نفس كلمة المرور: تكلفة bcrypt مرة واحدة
             
             db_user = User(
                 user_id=identifier,
@@ -519,6 +523,7 @@ def sync_student_data_from_university(db_users: Session, db_progress: Session, u
         # حذف المقررات المتبقية القديمة
         db_progress.query(RemainingCourse).filter(RemainingCourse.user_id == user_id).delete()
         
+        remaining_rows = []
         for course in remaining_courses:
             course_code = course.get('course_code') or course.get('رمز المقرر') or course.get('المقرر', '')
             course_name = course.get('course_name') or course.get('اسم المقرر') or course.get('المقرر', '')
@@ -531,15 +536,16 @@ def sync_student_data_from_university(db_users: Session, db_progress: Session, u
                 except:
                     hours = 0
                 
-                remaining = RemainingCourse(
-                    user_id=user_id,
-                    course_code=course_code,
-                    course_name=course_name,
-                    hours=hours,
-                    prerequisites=prerequisites,
-                    raw_data=course
-                )
-                db_progress.add(remaining)
+                remaining_rows.append({
+                    "user_id": user_id,
+                    "course_code": course_code,
+                    "course_name": course_name,
+                    "hours": hours,
+                    "prerequisites": prerequisites,
+                    "raw_data": course
+                })
+        # إدراج جميع المقررات المتبقية في جملة واحدة (يتم الـ commit مع باقي التغييرات أدناه)
+        bulk_insert(db_progress, RemainingCourse, remaining_rows, commit=False)
         
         # تحديث وقت آخر مزامنة
         user = db_users.query(User).filter(User.user_id == user_id).first()
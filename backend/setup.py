@@ -0,0 +1,38 @@
+"""
+بناء اختياري لوحدات المسار الساخن كامتدادات C باستخدام mypyc.
+
+الاستخدام (داخل مجلد backend):
+    pip install "mypy==1.8.0"
+    python setup.py build_ext --inplace
+
+ملفات ‎.so الناتجة تُحمَّل بدلاً من ملفات ‎.py المقابلة. للعودة إلى Python الخالص
+(مثلاً عند التصحيح) يكفي حذف ملفات ‎.so أو البناء مع MYPYC_COMPILE=0.
+"""
+import os
+
+from setuptools import setup
+
+# الوحدات التي تُنفذ في كل طلب (الوسطاء، التحقق من المدخلات وتنظيفها)
+# ملاحظة: main.py غير مشمول لأن FastAPI يعتمد على inspect.signature و Annotated
+# في دوال المسارات لحقن الاعتماديات، وهذا غير مضمون للدوال المترجمة.
+# services/notifications_service.py غير مشمول حالياً: mypyc 1.8 يولّد C غير صالح
+# لنماذج Pydantic المعرّفة فيه (CPyModule_pydantic___main غير معرّف).
+MYPYC_MODULES = [
+    "security_middleware.py",
+]
+
+ext_modules = []
+if os.getenv("MYPYC_COMPILE", "1") == "1":
+    from mypyc.build import mypycify
+
+    # الوحدات المستوردة (SQLAlchemy، FastAPI...) تبقى Python عادية ولا تُفحص أنواعها هنا
+    ext_modules = mypycify(
+        ["--ignore-missing-imports", "--disable-error-code=import-untyped", "--follow-imports=silent", *MYPYC_MODULES],
+        opt_level="3",
+    )
+
+setup(
+    name="advisor-backend-native",
+    py_modules=[],
+    ext_modules=ext_modules,
+)
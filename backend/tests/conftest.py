@@ -0,0 +1,53 @@
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+
+# يجب ضبط البيئة قبل استيراد database (المحركات تُنشأ عند الاستيراد).
+# القيم تُفرض دون setdefault: DATABASE_URL مضبوط دائماً داخل حاوية backend،
+# والاختبارات تحذف الجداول، فلا يجوز أن تصل إلى قاعدة حقيقية
+_TMP_DIR = tempfile.mkdtemp(prefix="advisor-tests-")
+TEST_DB_PATH = os.path.join(_TMP_DIR, "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH}"
+os.environ["SKIP_DB_INIT"] = "1"
+os.environ["SECRET_KEY"] = "test-secret-key"
+os.environ["LOG_DIR"] = os.path.join(_TMP_DIR, "logs")
+os.environ["CONFIG_FILE_PATH"] = os.path.join(REPO_DIR, "config", "settings.json")
+# الاختبارات تستخدم الكاش في الذاكرة وعداد المعدل المحلي
+os.environ.pop("REDIS_CACHE_URL", None)
+os.environ.pop("RATE_LIMIT_REDIS_URL", None)
+
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def db_tables():
+    """إنشاء الجداول على قاعدة SQLite المؤقتة وحذفها بعد الاختبار."""
+    import database
+
+    # حماية إضافية: لا إنشاء ولا حذف إلا على ملف SQLite المؤقت الخاص بالاختبارات
+    for engine in (database.ENGINE, database.ASYNC_ENGINE):
+        if engine.url.get_backend_name() != "sqlite" or engine.url.database != TEST_DB_PATH:
+            pytest.exit(f"Refusing to run database tests against {engine.url!r}", returncode=1)
+
+    database.Base.metadata.create_all(bind=database.ENGINE)
+    yield database
+    database.Base.metadata.drop_all(bind=database.ENGINE)
+
+
+@pytest.fixture(scope="session")
+def progress_service():
+    """
+    تحميل services/progress_service.py مباشرة.
+    services/__init__ يستورد كل الخدمات (LangChain، Chroma، Neo4j) ولا تحتاجها هذه الاختبارات.
+    """
+    path = os.path.join(BACKEND_DIR, "services", "progress_service.py")
+    spec = importlib.util.spec_from_file_location("progress_service", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import cache_manager as cm
+
+
+class FakeRedis:
+    """عميل Redis وهمي يسجل عمليات الـ pipeline."""
+
+    def __init__(self, fail_pipeline=False):
+        self.store = {}
+        self.executed = []
+        self.fail_pipeline = fail_pipeline
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def get(self, key):
+        return self.store.get(key)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def setex(self, key, ttl, value):
+        self._ops.append(("setex", key, ttl, value))
+
+    def get(self, key):
+        self._ops.append(("get", key))
+
+    def execute(self):
+        if self._client.fail_pipeline:
+            raise ConnectionError("redis down")
+        self._client.executed.append(list(self._ops))
+        results = []
+        for op in self._ops:
+            if op[0] == "setex":
+                _, key, _, value = op
+                self._client.store[key] = value
+                results.append(True)
+            else:
+                results.append(self._client.store.get(op[1]))
+        return results
+
+
+@pytest.fixture
+def manager():
+    # بدون REDIS_CACHE_URL لا يبدأ خيط الكتابة ويُستخدم الكاش في الذاكرة
+    return cm.CacheManager()
+
+
+def test_serialize_round_trip(manager):
+    value = {"answer": "متطلبات التخرج", "courses": ["CS101", "MATH101"], "gpa": 3.5, "ok": True, "none": None}
+    serialized = manager._serialize(value)
+    assert isinstance(serialized, bytes)
+    assert manager._deserialize(serialized) == value
+
+
+def test_serialize_passes_strings_through(manager):
+    assert manager._serialize("plain") == "plain"
+    assert manager._deserialize(b"not json") == "not json"
+    assert manager._deserialize(None) is None
+
+
+def test_ttl_cache_heap_stays_bounded_on_overwrites():
+    cache = cm._InMemoryTTLCache()
+    for i in range(1000):
+        cache.set("hot", i, ttl_seconds=86400)
+    cache.set("cold", "x", ttl_seconds=86400)
+
+    assert cache.get("hot") == 999
+    assert len(cache._expiry_heap) <= 2 * len(cache._store)
+
+
+def test_ttl_cache_expires_after_compaction():
+    cache = cm._InMemoryTTLCache()
+    for i in range(10):
+        cache.set("k", i, ttl_seconds=60)
+    cache.set("short", "x", ttl_seconds=1)
+
+    cache.expire(now=time.time() + 30)
+    assert cache._store.keys() == {"k"}
+    cache.expire(now=time.time() + 120)
+    assert cache._store == {}
+    assert cache._expiry_heap == []
+
+
+def test_set_get_in_memory_fallback(manager):
+    manager.set("k", {"a": 1}, ttl_seconds=60)
+    assert manager.get("k") == {"a": 1}
+    assert manager.get("missing") is None
+
+
+def test_set_is_queued_until_flush(manager):
+    fake = FakeRedis()
+    manager._redis_client = fake
+    manager.set("k1", {"a": 1}, ttl_seconds=30)
+    manager.set("k2", [1, 2], ttl_seconds=60)
+    # لا كتابة قبل أن يفرغ الخيط (أو flush) الطابور
+    assert fake.store == {}
+
+    manager.flush()
+
+    assert len(fake.executed) == 1
+    assert [op[:3] for op in fake.executed[0]] == [("setex", "k1", 30), ("setex", "k2", 60)]
+    assert manager.get("k1") == {"a": 1}
+    assert manager.get("k2") == [1, 2]
+
+
+def test_failed_pipeline_falls_back_to_memory(manager):
+    manager._redis_client = FakeRedis(fail_pipeline=True)
+    manager.set("k", {"a": 1})
+    manager.flush()
+    assert manager._fallback_cache.get("k") is not None
+    assert manager.get("k") == {"a": 1}
+
+
+def test_mget_uses_one_round_trip(manager):
+    fake = FakeRedis()
+    manager._redis_client = fake
+    manager.mset({"a": 1, "b": {"x": "y"}})
+    fake.executed.clear()
+
+    assert manager.mget(["a", "b", "c"]) == [1, {"x": "y"}, None]
+    assert len(fake.executed) == 1
+
+
+def test_batcher_coalesces_reads_off_the_event_loop():
+    calls = []
+
+    class Manager:
+        def mget(self, keys):
+            calls.append((list(keys), threading.current_thread() is threading.main_thread()))
+            return [key.upper() for key in keys]
+
+    async def run():
+        batcher = cm.CacheBatcher(Manager())
+        results = await asyncio.gather(batcher.get("a"), batcher.get("b"), batcher.get("a"))
+        await batcher.flush()
+        return results
+
+    assert asyncio.run(run()) == ["A", "B", "A"]
+    assert calls == [(["a", "b"], False)]
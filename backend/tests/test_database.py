@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+
+
+class _CapturingSession:
+    """جلسة وهمية تلتقط الجملة المنفذة مع لهجة محددة."""
+
+    def __init__(self, dialect_name):
+        self.dialect_name = dialect_name
+        self.statements = []
+        self.committed = False
+
+    def get_bind(self):
+        dialect = type("Dialect", (), {"name": self.dialect_name})()
+        return type("Bind", (), {"dialect": dialect})()
+
+    def execute(self, stmt, rows):
+        self.statements.append((stmt, rows))
+
+    def commit(self):
+        self.committed = True
+
+
+def test_bulk_insert_inserts_all_rows(db_tables):
+    rows = [
+        {"user_id": "u1", "role": "user", "content": "سؤال"},
+        {"user_id": "u1", "role": "assistant", "content": "جواب"},
+    ]
+    with db_tables.SessionLocal() as session:
+        db_tables.bulk_insert(session, db_tables.ChatMessage, rows)
+        count = session.scalar(select(func.count()).select_from(db_tables.ChatMessage))
+    assert count == 2
+
+
+def test_bulk_insert_skips_empty_rows(db_tables):
+    session = _CapturingSession("postgresql")
+    db_tables.bulk_insert(session, db_tables.ChatMessage, [])
+    assert session.statements == []
+    assert not session.committed
+
+
+def test_bulk_insert_ignore_conflicts_on_postgresql(db_tables):
+    session = _CapturingSession("postgresql")
+    rows = [{"user_id": "u1", "role": "user", "content": "x"}]
+    db_tables.bulk_insert(session, db_tables.ChatMessage, rows, ignore_conflicts=True, commit=False)
+
+    stmt, executed_rows = session.statements[0]
+    assert executed_rows == rows
+    assert "ON CONFLICT DO NOTHING" in str(stmt.compile(dialect=postgresql.dialect()))
+    assert not session.committed
+
+
+def test_bulk_insert_ignore_conflicts_is_plain_insert_elsewhere(db_tables):
+    session = _CapturingSession("sqlite")
+    db_tables.bulk_insert(session, db_tables.ChatMessage, [{"user_id": "u1"}], ignore_conflicts=True)
+
+    stmt, _ = session.statements[0]
+    assert "ON CONFLICT" not in str(stmt.compile(dialect=postgresql.dialect()))
+    assert session.committed
+
+
+def test_chat_history_orders_tied_timestamps_by_id(db_tables):
+    # كل الرسائل بنفس الوقت: الترتيب يجب أن يتبع id
+    same_time = datetime(2026, 1, 1, 12, 0, 0)
+    with db_tables.SessionLocal() as session:
+        for i in range(6):
+            session.add(db_tables.ChatMessage(
+                user_id="u1",
+                role="user" if i % 2 == 0 else "assistant",
+                content=str(i),
+                created_at=same_time,
+            ))
+        session.add(db_tables.ChatMessage(user_id="u2", role="user", content="other", created_at=same_time))
+        session.commit()
+
+    async def fetch():
+        async with db_tables.AsyncSessionLocal() as session:
+            return await db_tables.get_chat_history(session, "u1", limit=4)
+
+    records = asyncio.run(fetch())
+    assert [record.content for record in records] == ["2", "3", "4", "5"]
+    assert [record.role for record in records] == ["user", "assistant", "user", "assistant"]
+
+
+def test_chat_history_returns_latest_messages_oldest_first(db_tables):
+    with db_tables.SessionLocal() as session:
+        for minute in (3, 1, 2):
+            session.add(db_tables.ChatMessage(
+                user_id="u1", role="user", content=f"m{minute}",
+                created_at=datetime(2026, 1, 1, 12, minute),
+            ))
+        session.commit()
+
+    async def fetch():
+        async with db_tables.AsyncSessionLocal() as session:
+            return await db_tables.get_chat_history(session, "u1", limit=2)
+
+    assert [record.content for record in asyncio.run(fetch())] == ["m2", "m3"]
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+
+def _add_records(database, user_id, grades):
+    with database.SessionLocal() as session:
+        for code, grade in grades.items():
+            session.add(database.ProgressRecord(user_id=user_id, course_code=code, grade=grade, hours=3))
+        session.commit()
+
+
+def _analyze_async(database, progress_service, user_id):
+    async def run():
+        async with database.AsyncSessionLocal() as session:
+            return await progress_service.analyze_progress_async(session, user_id)
+
+    return asyncio.run(run())
+
+
+def test_analyze_progress_async(db_tables, progress_service):
+    _add_records(db_tables, "u1", {"CS101": "A", "MATH101": "B"})
+    _add_records(db_tables, "u2", {"PHYS101": "C"})
+
+    result = _analyze_async(db_tables, progress_service, "u1")
+
+    assert result["current_gpa"] == 3.5
+    assert result["completed_hours"] == 6
+    assert result["remaining_hours"] == 124
+    assert result["completed_courses"] == {"CS101": "A", "MATH101": "B"}
+    assert {course["code"] for course in result["registerable_next_semester"]} == {"CS102", "PHYS101", "DS310"}
+
+
+def test_analyze_progress_async_matches_sync(db_tables, progress_service):
+    _add_records(db_tables, "u1", {"CS101": "A", "CS102": "B+", "MATH101": "C"})
+
+    async_result = _analyze_async(db_tables, progress_service, "u1")
+    with db_tables.SessionLocal() as session:
+        sync_result = progress_service.analyze_progress(session, None, "u1")
+
+    key = lambda course: course["code"]
+    assert sorted(async_result.pop("registerable_next_semester"), key=key) == sorted(
+        sync_result.pop("registerable_next_semester"), key=key
+    )
+    assert async_result == sync_result
+
+
+def test_analyze_progress_async_without_records(db_tables, progress_service):
+    result = _analyze_async(db_tables, progress_service, "nobody")
+    assert result["current_gpa"] == 0.0
+    assert result["completed_hours"] == 0
+    assert result["completed_courses"] == {}
+
+
+def test_analyze_progress_async_wraps_errors(progress_service):
+    class BrokenSession:
+        async def execute(self, stmt):
+            raise RuntimeError("db down")
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(progress_service.analyze_progress_async(BrokenSession(), "u1"))
+    assert exc_info.value.status_code == 500
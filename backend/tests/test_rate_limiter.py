@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+import security_middleware
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock(1_000_000.0)
+    monkeypatch.setattr(security_middleware.time, "time", fake.time)
+    return fake
+
+
+@pytest.fixture
+def limiter():
+    limiter = security_middleware.RedisRateLimiter()
+    assert limiter._redis is None  # بدون RATE_LIMIT_REDIS_URL يُستخدم العداد المحلي
+    return limiter
+
+
+def _allowed(limiter, key, limit=3, window=60):
+    return asyncio.run(limiter.is_allowed(key, limit, window))
+
+
+def test_local_limit_within_window(limiter, clock):
+    assert [_allowed(limiter, "ip:1") for _ in range(4)] == [True, True, True, False]
+
+
+def test_local_keys_are_counted_separately(limiter, clock):
+    for _ in range(3):
+        _allowed(limiter, "ip:1")
+    assert _allowed(limiter, "ip:1") is False
+    assert _allowed(limiter, "ip:2") is True
+
+
+def test_local_counter_resets_in_next_window(limiter, clock):
+    for _ in range(4):
+        _allowed(limiter, "ip:1")
+    clock.now += 60
+    assert _allowed(limiter, "ip:1") is True
+    # العدادات القديمة تُمسح عند بدء نافذة جديدة
+    assert limiter._local_counts == {"ip:1": 1}
+
+
+class FakeAsyncRedis:
+    def __init__(self, fail=False):
+        self.counts = {}
+        self.expiries = {}
+        self.fail = fail
+
+    def pipeline(self, transaction=True):
+        return FakeAsyncPipeline(self)
+
+
+class FakeAsyncPipeline:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def incr(self, key):
+        self._ops.append(("incr", key))
+
+    def expire(self, key, seconds):
+        self._ops.append(("expire", key, seconds))
+
+    async def execute(self):
+        if self._client.fail:
+            raise ConnectionError("redis down")
+        results = []
+        for op in self._ops:
+            if op[0] == "incr":
+                self._client.counts[op[1]] = self._client.counts.get(op[1], 0) + 1
+                results.append(self._client.counts[op[1]])
+            else:
+                self._client.expiries[op[1]] = op[2]
+                results.append(True)
+        return results
+
+
+def test_redis_counter_uses_one_key_per_window(limiter, clock):
+    fake = FakeAsyncRedis()
+    limiter._redis = fake
+    assert [_allowed(limiter, "ip:1") for _ in range(4)] == [True, True, True, False]
+
+    bucket = int(clock.now) // 60
+    assert fake.counts == {f"rl:ip:1:{bucket}": 4}
+    assert fake.expiries == {f"rl:ip:1:{bucket}": 60}
+
+    clock.now += 60
+    assert _allowed(limiter, "ip:1") is True
+    assert fake.counts[f"rl:ip:1:{bucket + 1}"] == 1
+
+
+def test_redis_failure_falls_back_to_local(limiter, clock):
+    limiter._redis = FakeAsyncRedis(fail=True)
+    assert _allowed(limiter, "ip:1") is True
+    assert limiter._redis is None
+    assert limiter._local_counts == {"ip:1": 1}
@@ -0,0 +1,38 @@
+-- ترحيل يدوي لمرة واحدة لقواعد PostgreSQL الموجودة قبل تغييرات المخطط التالية:
+--   * القيم الافتراضية للطوابع الزمنية في قاعدة البيانات (created_at / updated_at)
+--   * الفهارس المركبة وفهارس GIN على raw_data
+--   * تحويل raw_data من json إلى jsonb
+--
+-- Base.metadata.create_all في init_db() ينشئ كل ذلك للجداول الجديدة فقط ولا يعدل الجداول القائمة.
+-- شغّل الملف مرة واحدة أثناء نافذة صيانة (ALTER TABLE يأخذ قفل ACCESS EXCLUSIVE):
+--   psql "$DATABASE_URL" -f docs/migrations/001_timestamp_defaults_and_indexes.sql
+-- الأوامر آمنة عند إعادة التشغيل.
+
+BEGIN;
+
+-- القيم الافتراضية للطوابع الزمنية (توقيت UTC بدون منطقة زمنية)
+ALTER TABLE users                 ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', clock_timestamp());
+ALTER TABLE progress_records      ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', clock_timestamp());
+ALTER TABLE progress_records      ALTER COLUMN updated_at SET DEFAULT TIMEZONE('utc', clock_timestamp());
+ALTER TABLE student_academic_info ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', clock_timestamp());
+ALTER TABLE student_academic_info ALTER COLUMN updated_at SET DEFAULT TIMEZONE('utc', clock_timestamp());
+ALTER TABLE remaining_courses     ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', clock_timestamp());
+ALTER TABLE remaining_courses     ALTER COLUMN updated_at SET DEFAULT TIMEZONE('utc', clock_timestamp());
+ALTER TABLE notifications         ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', clock_timestamp());
+ALTER TABLE chat_messages         ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', clock_timestamp());
+
+-- json -> jsonb (شرط لفهارس GIN)
+ALTER TABLE student_academic_info ALTER COLUMN raw_data TYPE jsonb USING raw_data::jsonb;
+ALTER TABLE remaining_courses     ALTER COLUMN raw_data TYPE jsonb USING raw_data::jsonb;
+
+COMMIT;
+
+-- الفهارس (CONCURRENTLY لا يعمل داخل معاملة، لذا خارج BEGIN/COMMIT)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_progress_user_course   ON progress_records (user_id, course_code);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_progress_user_semester ON progress_records (user_id, semester);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_remaining_user_course  ON remaining_courses (user_id, course_code);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notif_user_created     ON notifications (user_id, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notif_user_type_time   ON notifications (user_id, type, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_user_created      ON chat_messages (user_id, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_student_raw_gin        ON student_academic_info USING gin (raw_data);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_remaining_raw_gin      ON remaining_courses USING gin (raw_data);